@@ -0,0 +1,186 @@
+"""Local stand-in for the DWD and Nominatim backends used by the load test.
+
+`install()` patches the request classes the app imports, so the pages run unchanged
+against a deterministic synthetic station catalog and temperature series.
+"""
+import contextlib
+import datetime as dt
+import hashlib
+import math
+import time
+import types
+from unittest import mock
+
+import numpy as np
+import polars as pl
+import requests
+import wetterdienst
+
+import helper_function.closest_stations
+import helper_function.daily_temperature
+import helper_function.get_coord_from_nominatim
+import helper_function.hourly_temperature
+
+KNOWN_LOCATIONS = {
+    "St. Laurentius Rheinhausen": (49.2767, 8.4556),
+    "Potsdam": (52.4009, 13.0591),
+    "Berlin": (52.5170, 13.3889),
+    "Hamburg": (53.5503, 10.0007),
+    "München": (48.1372, 11.5755),
+    "Köln": (50.9384, 6.9599),
+    "Freiburg": (47.9960, 7.8494),
+}
+
+
+def _seed(*parts) -> int:
+    return int(hashlib.sha256(repr(parts).encode()).hexdigest()[:8], 16)
+
+
+def _station_catalog() -> pl.DataFrame:
+    """A grid of stations covering Germany with a 20 km spacing."""
+    latitudes = np.arange(47.3, 55.0, 0.18)
+    longitudes = np.arange(5.9, 15.0, 0.27)
+    lat, lon = (grid.ravel() for grid in np.meshgrid(latitudes, longitudes))
+    station_ids = [f"{i:05d}" for i in range(1, lat.size + 1)]
+    return pl.DataFrame({
+        "station_id": station_ids,
+        "start_date": [dt.datetime(1990, 1, 1, tzinfo=dt.timezone.utc)] * lat.size,
+        "end_date": [dt.datetime(2030, 12, 31, tzinfo=dt.timezone.utc)] * lat.size,
+        "latitude": lat,
+        "longitude": lon,
+        "height": np.full(lat.size, 100.0),
+        "name": [f"Station {station_id}" for station_id in station_ids],
+        "state": ["Fake"] * lat.size,
+    })
+
+
+STATIONS = _station_catalog()
+
+
+def _distance_km(lat: float, lon: float) -> pl.Expr:
+    """Haversine distance of every catalog station to (lat, lon)."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = pl.col("latitude").radians(), pl.col("longitude").radians()
+    a = ((lat2 - lat1) / 2).sin() ** 2 + math.cos(lat1) * lat2.cos() * ((lon2 - lon1) / 2).sin() ** 2
+    return 2 * 6371.0 * a.sqrt().arcsin()
+
+
+def _values(station_ids, parameters, resolution, start_date, end_date) -> pl.DataFrame:
+    """Synthetic seasonal temperature (Kelvin) per station and parameter."""
+    every = "1h" if str(resolution).lower().endswith("hourly") else "1d"
+    dates = pl.datetime_range(
+        start_date.replace(tzinfo=None), end_date.replace(tzinfo=None), every, time_zone="UTC", eager=True
+    )
+    day_of_year = dates.dt.ordinal_day().to_numpy()
+    frames = []
+    for station_id in station_ids:
+        for parameter in parameters:
+            rng = np.random.default_rng(_seed(station_id, parameter))
+            value = 283.15 + 10 * np.sin(2 * np.pi * (day_of_year - 110) / 365) + rng.normal(0, 3, dates.len())
+            frames.append(pl.DataFrame({
+                "station_id": station_id,
+                "dataset": "climate_summary",
+                "parameter": parameter,
+                "date": dates,
+                "value": value,
+                "quality": 10.0,
+            }))
+    return pl.concat(frames) if frames else pl.DataFrame()
+
+
+class FakeResult:
+    """Mimics the parts of wetterdienst's StationsResult the app uses."""
+
+    def __init__(self, df: pl.DataFrame, request: "FakeRequest"):
+        self.df = df
+        self._request = request
+
+    @property
+    def values(self):
+        request = self._request
+        return types.SimpleNamespace(all=lambda: types.SimpleNamespace(df=request.fetch_values(self.df["station_id"].to_list())))
+
+
+class FakeRequest:
+    """Mimics DwdObservationRequest and the request returned by `Wetterdienst(...)(...)`."""
+
+    latency = 0.0
+
+    def __init__(self, parameter=None, resolution=None, start_date=None, end_date=None, **kwargs):
+        self.parameters = [str(getattr(p, "name", p)).lower() for p in (parameter if isinstance(parameter, (list, tuple)) else [parameter])]
+        self.resolution = getattr(resolution, "value", resolution)
+        self.start_date = start_date or dt.datetime(2023, 1, 1)
+        self.end_date = end_date or dt.datetime(2023, 12, 31)
+
+    def _network(self, years: int = 1):
+        # Simulate the download and parse time of the real backend, longer periods take longer
+        time.sleep(self.latency * years)
+
+    def all(self) -> FakeResult:
+        self._network()
+        return FakeResult(STATIONS, self)
+
+    def filter_by_station_id(self, station_id) -> FakeResult:
+        self._network()
+        station_ids = [station_id] if isinstance(station_id, str) else list(station_id)
+        return FakeResult(STATIONS.filter(pl.col("station_id").is_in(station_ids)), self)
+
+    def filter_by_distance(self, latlon, distance, unit="km") -> FakeResult:
+        self._network()
+        df = STATIONS.with_columns(_distance_km(*latlon).alias("distance"))
+        return FakeResult(df.filter(pl.col("distance") <= distance).sort("distance"), self)
+
+    def fetch_values(self, station_ids) -> pl.DataFrame:
+        self._network(years=self.end_date.year - self.start_date.year + 1)
+        return _values(station_ids, self.parameters, self.resolution, self.start_date, self.end_date)
+
+
+class FakeApi:
+    """Wraps the real Wetterdienst API class, metadata is served locally and requests are faked."""
+
+    def __init__(self, provider: str, network: str):
+        self._api = _real_wetterdienst(provider, network)
+
+    def __getattr__(self, name):
+        return getattr(self._api, name)
+
+    def __call__(self, **kwargs) -> FakeRequest:
+        return FakeRequest(**kwargs)
+
+
+_real_wetterdienst = wetterdienst.Wetterdienst
+
+
+def fake_nominatim_get(endpoint, params=None, headers=None, **kwargs):
+    """Resolve known locations, anything else is placed deterministically inside Germany."""
+    time.sleep(FakeRequest.latency)
+    address = params["q"]
+    if address in KNOWN_LOCATIONS:
+        lat, lon = KNOWN_LOCATIONS[address]
+    else:
+        seed = _seed(address)
+        lat, lon = 48.0 + (seed % 600) / 100, 7.0 + (seed // 600 % 700) / 100
+    response = requests.Response()
+    response.status_code = 200
+    response._content = f'[{{"lat": "{lat}", "lon": "{lon}"}}]'.encode()
+    return response
+
+
+@contextlib.contextmanager
+def install(latency: float = 0.0):
+    """Route all DWD and Nominatim calls of the app to the local stand-in."""
+    FakeRequest.latency = latency
+    with contextlib.ExitStack() as stack:
+        for module in (
+            helper_function.closest_stations,
+            helper_function.daily_temperature,
+            helper_function.hourly_temperature,
+        ):
+            stack.enter_context(mock.patch.object(module, "DwdObservationRequest", FakeRequest))
+        stack.enter_context(mock.patch.object(wetterdienst, "Wetterdienst", FakeApi))
+        stack.enter_context(mock.patch.object(
+            helper_function.get_coord_from_nominatim,
+            "requests",
+            types.SimpleNamespace(get=fake_nominatim_get, RequestException=requests.RequestException),
+        ))
+        yield
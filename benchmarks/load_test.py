@@ -0,0 +1,299 @@
+"""Concurrent-session load test for the Streamlit pages.
+
+Starts one `streamlit run` server process (`benchmarks.serve`) against the local stand-in
+in `benchmarks.fake_backend` and drives N concurrent browser sessions over its websocket
+through interaction scripts. The sessions share the process like real users do: its GIL,
+`st.cache_data`/`st.cache_resource`, the single-flight registry and the observation cache.
+
+Reported per page and session count:
+- p50/p95/p99 ms: time from an interaction until its script run finished (first render)
+- p95 done: time until the page is complete, including the fragment reruns that poll
+  for background results
+- rerun/s: interactions completed per second over all sessions
+- MB/sess: growth of the server's resident memory over a warmed-up baseline, per session
+- coalesced: fetches that waited on an identical in-flight fetch in the server
+
+    python -m benchmarks.load_test --page Gradtagzahl --sessions 20 --iterations 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from benchmarks import fake_backend
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES = ["Gradtagzahl", "Datenexplorer"]
+TIMEOUT = 120
+SERVER_START_TIMEOUT = 60
+# Seconds between samples of the server's resident memory
+RSS_INTERVAL = 0.1
+
+RUN_FINISHED = {
+    ForwardMsg.ScriptFinishedStatus.FINISHED_SUCCESSFULLY,
+    ForwardMsg.ScriptFinishedStatus.FINISHED_WITH_COMPILE_ERROR,
+    ForwardMsg.ScriptFinishedStatus.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+}
+
+
+class Session:
+    """A browser session: keeps the rendered widgets and their values, and replays reruns over the websocket."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.pages: dict[str, str] = {}
+        self.page_script_hash = ""
+        self.widgets: dict[str, tuple[str, object]] = {}
+        self.values: dict[str, tuple[str, object]] = {}
+        self.auto_reruns: dict[str, float] = {}
+
+    async def __aenter__(self):
+        self.ws = await websockets.connect(self.url, max_size=None, open_timeout=TIMEOUT)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.ws.close()
+
+    def set_value(self, label: str, value):
+        widget_id, element = self.widgets[label]
+        if element.WhichOneof("type") == "slider":
+            self.values[widget_id] = ("double_array_value", [value])
+        elif element.WhichOneof("type") == "number_input":
+            self.values[widget_id] = ("int_value" if element.number_input.data_type == 0 else "double_value", value)
+        else:
+            self.values[widget_id] = ("string_value", value)
+
+    def _client_state(self, fragment_id: str = "") -> BackMsg:
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.page_script_hash = self.page_script_hash
+        state.fragment_id = fragment_id
+        state.is_auto_rerun = bool(fragment_id)
+        for widget_id, (field, value) in self.values.items():
+            widget = state.widget_states.widgets.add()
+            widget.id = widget_id
+            if field == "double_array_value":
+                widget.double_array_value.data.extend(value)
+            else:
+                setattr(widget, field, value)
+        return msg
+
+    async def _script_run(self, fragment_id: str = ""):
+        """Request a rerun and read the forward messages until its script run finished."""
+        await self.ws.send(self._client_state(fragment_id).SerializeToString())
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(await asyncio.wait_for(self.ws.recv(), TIMEOUT))
+            kind = msg.WhichOneof("type")
+            if kind == "new_session" and not msg.new_session.fragment_ids_this_run:
+                # A full script run starts: the frontend drops the fragment timers and elements
+                self.auto_reruns.clear()
+                self.widgets.clear()
+                self.page_script_hash = msg.new_session.page_script_hash
+            elif kind == "navigation":
+                self.pages = {page.page_name: page.page_script_hash for page in msg.navigation.app_pages}
+            elif kind == "auto_rerun":
+                self.auto_reruns[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "exception":
+                    raise RuntimeError(f"page raised: {element.exception.message}")
+                widget = getattr(element, element_type)
+                if getattr(widget, "id", "") and getattr(widget, "label", ""):
+                    self.widgets[widget.label] = (widget.id, element)
+            elif kind == "script_finished" and msg.script_finished in RUN_FINISHED:
+                break
+        # Like the frontend, only send the values of widgets that are still rendered
+        rendered = {widget_id for widget_id, _ in self.widgets.values()}
+        self.values = {widget_id: value for widget_id, value in self.values.items() if widget_id in rendered}
+
+    async def rerun(self, page_script_hash: str | None = None) -> tuple[float, float]:
+        """Rerun the page and poll its fragments until they stop, returns (first render, complete) in seconds."""
+        if page_script_hash is not None:
+            self.page_script_hash = page_script_hash
+        start = time.perf_counter()
+        await self._script_run()
+        first_render = time.perf_counter() - start
+        while self.auto_reruns:
+            fragment_id, interval = next(iter(self.auto_reruns.items()))
+            await asyncio.sleep(interval)
+            await self._script_run(fragment_id)
+        return first_render, time.perf_counter() - start
+
+
+def change_location(session: Session, rng: random.Random):
+    session.set_value("Ort", rng.choice(list(fake_backend.KNOWN_LOCATIONS)))
+
+
+def move_slider(session: Session, rng: random.Random):
+    session.set_value("Anzahl an Stationen", rng.randint(1, 10))
+
+
+def change_year(session: Session, rng: random.Random):
+    session.set_value("Jahr", rng.randint(2004, 2023))
+
+
+def run_sql(session: Session, rng: random.Random):
+    session.set_value("sql query", rng.choice([
+        "SELECT date, value, parameter FROM df WHERE parameter IS NOT NULL",
+        "SELECT parameter, avg(value) AS value, min(date) AS date FROM df GROUP BY parameter",
+        "SELECT date, value, parameter FROM df WHERE value > 283.15",
+    ]))
+
+
+SCRIPTS = {
+    "Gradtagzahl": [move_slider, change_year, change_location, move_slider, change_year],
+    "Datenexplorer": [run_sql, move_slider, change_location, run_sql],
+}
+
+
+async def run_session(url: str, page: str, iterations: int, seed: int, start: asyncio.Event | None, timings: list):
+    """Open the page like a user coming from the start page and replay its script."""
+    rng = random.Random(seed)
+    async with Session(url) as session:
+        if start is not None:
+            await start.wait()
+        timings.append(await session.rerun())
+        timings.append(await session.rerun(session.pages[page]))
+        for _ in range(iterations):
+            for step in SCRIPTS[page]:
+                step(session, rng)
+                timings.append(await session.rerun())
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmRSS:")) / 2**10
+
+
+async def _sample_rss(pid: int, samples: list[float]):
+    while True:
+        samples.append(_rss_mb(pid))
+        await asyncio.sleep(RSS_INTERVAL)
+
+
+def _start_server(port: int, latency: float, cache_dir: str, stats_file: Path) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.serve", "--port", str(port), "--latency", str(latency), "--stats-file", str(stats_file)],
+        cwd=ROOT,
+        env={**os.environ, "DWD_CACHE_DIR": cache_dir, "DWD_PREWARM": "false"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Server did not start")
+
+
+async def _drive(url: str, pid: int, page: str, sessions: int, iterations: int) -> dict:
+    # Warm-up session: imports and compiles the pages, so the baseline memory excludes them
+    await run_session(url, page, 0, -1, None, [])
+    baseline = _rss_mb(pid)
+
+    rss_samples = []
+    sampler = asyncio.create_task(_sample_rss(pid, rss_samples))
+    start_event = asyncio.Event()
+    timings = [[] for _ in range(sessions)]
+    tasks = [asyncio.create_task(run_session(url, page, iterations, seed, start_event, timings[seed])) for seed in range(sessions)]
+    # Wait until every session is connected
+    await asyncio.sleep(0.5)
+    start = time.perf_counter()
+    start_event.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    wall_time = time.perf_counter() - start
+    sampler.cancel()
+
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {sessions} sessions failed, first error: {errors[0]!r}")
+    return {
+        "timings": [timing for session_timings in timings for timing in session_timings],
+        "wall_time": wall_time,
+        "memory_mb": max(rss_samples) - baseline,
+    }
+
+
+def load_test(page: str, sessions: int, iterations: int, latency: float) -> dict:
+    """Run `sessions` concurrent sessions against a fresh server and collect latency, throughput and memory."""
+    # Every run starts with a cold observation cache owned by the harness
+    cache_dir = tempfile.mkdtemp(prefix="dwdweather-loadtest-")
+    stats_file = Path(cache_dir) / "single_flight.json"
+    port = _free_port()
+    try:
+        server = _start_server(port, latency, cache_dir, stats_file)
+        try:
+            r = asyncio.run(_drive(f"ws://localhost:{port}/_stcore/stream", server.pid, page, sessions, iterations))
+        finally:
+            server.terminate()
+            server.wait(timeout=TIMEOUT)
+        flights = json.loads(stats_file.read_text())
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    first_render = [first for first, _ in r["timings"]]
+    complete = [done for _, done in r["timings"]]
+    percentiles = statistics.quantiles(first_render, n=100, method="inclusive")
+    return {
+        "page": page,
+        "sessions": sessions,
+        "reruns": len(first_render),
+        "p50_ms": percentiles[49] * 1000,
+        "p95_ms": percentiles[94] * 1000,
+        "p99_ms": percentiles[98] * 1000,
+        "p95_done_ms": statistics.quantiles(complete, n=100, method="inclusive")[94] * 1000,
+        "throughput_rps": len(first_render) / r["wall_time"],
+        "memory_mb_per_session": r["memory_mb"] / sessions,
+        "coalesced": flights["coalesced"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page", choices=[*PAGES, "all"], default="all")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--iterations", type=int, default=2, help="repetitions of the interaction script per session")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated backend latency per call in seconds")
+    args = parser.parse_args()
+
+    pages = list(PAGES) if args.page == "all" else [args.page]
+    print(f"{'page':<14}{'sessions':>9}{'reruns':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'p95 done':>10}{'rerun/s':>9}{'MB/sess':>9}{'coalesced':>10}")
+    for page in pages:
+        for sessions in args.sessions:
+            r = load_test(page, sessions, args.iterations, args.latency)
+            print(
+                f"{r['page']:<14}{r['sessions']:>9}{r['reruns']:>8}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}{r['p99_ms']:>9.0f}"
+                f"{r['p95_done_ms']:>10.0f}{r['throughput_rps']:>9.1f}{r['memory_mb_per_session']:>9.1f}{r['coalesced']:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
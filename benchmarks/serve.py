@@ -0,0 +1,43 @@
+"""Run the app with `streamlit run` against the local stand-in in `benchmarks.fake_backend`.
+
+Started by the load test, every session it simulates connects to this one server process.
+
+    python -m benchmarks.serve --port 8599 --latency 0.05 --stats-file stats.json
+"""
+import argparse
+import atexit
+import json
+import sys
+from pathlib import Path
+
+from streamlit.web import cli
+
+from benchmarks import fake_backend
+from helper_function.single_flight import single_flight_stats
+
+MAIN_SCRIPT = Path(__file__).resolve().parent.parent / "dwdweather.py"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated backend latency per call in seconds")
+    parser.add_argument("--stats-file", type=Path, help="write the single-flight counters here on shutdown")
+    args = parser.parse_args()
+
+    if args.stats_file:
+        atexit.register(lambda: args.stats_file.write_text(json.dumps(single_flight_stats())))
+
+    with fake_backend.install(latency=args.latency):
+        sys.argv = [
+            "streamlit", "run", str(MAIN_SCRIPT),
+            "--server.port", str(args.port),
+            "--server.headless", "true",
+            "--server.fileWatcherType", "none",
+            "--browser.gatherUsageStats", "false",
+        ]
+        cli.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,8 @@ def main():
         st.session_state.point_coordinates = (None, None)
     if 'station_ids' not in st.session_state:
         st.session_state.station_ids = []
+    if 'candidate_station_ids' not in st.session_state:
+        st.session_state.candidate_station_ids = []
     if 'closest_stations_df' not in st.session_state:
         st.session_state.closest_stations_df = None
     if 'heating_threshold' not in st.session_state:
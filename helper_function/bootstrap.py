@@ -0,0 +1,60 @@
+import numpy as np
+import polars as pl
+
+
+def gtz_year_month_matrix(monthly_indicators: pl.DataFrame, years=None) -> tuple[np.ndarray, np.ndarray]:
+    """Monthly GTZ from `compute_indicators` as a year x month array (NaN for months without data) and the years of its rows.
+
+    The rows are the years in the data, or `years` if given, so a year without any data is a row of NaN.
+    """
+    monthly_gtz = monthly_indicators.with_columns(
+        pl.col("date").dt.year().alias("year"),
+        pl.col("date").dt.month().alias("month"),
+    )
+    if years is None:
+        years = monthly_gtz["year"].unique().to_numpy()
+    years = np.sort(np.asarray(years))
+    monthly_gtz = monthly_gtz.filter(pl.col("year").is_in(years.tolist()))
+
+    matrix = np.full((years.size, 12), np.nan)
+    matrix[np.searchsorted(years, monthly_gtz["year"].to_numpy()), monthly_gtz["month"].to_numpy() - 1] = monthly_gtz["gtz"].to_numpy()
+    return years, matrix
+
+
+def bootstrap_normals(matrix: np.ndarray, n_resamples: int = 10_000, seed: int = 0) -> np.ndarray:
+    """Resample the reference years with replacement, returns the monthly means as n_resamples x 12.
+
+    A month without data in any of the drawn years is NaN, without reference years all are NaN.
+    """
+    if matrix.shape[0] == 0:
+        return np.full((n_resamples, matrix.shape[1]), np.nan)
+    rng = np.random.default_rng(seed)
+    # All resamples at once: n_resamples x n_years indices into the year axis
+    indices = rng.integers(0, matrix.shape[0], size=(n_resamples, matrix.shape[0]))
+    resampled = matrix[indices]
+    # Mean over the years with data, spelled out as nanmean warns on months without any
+    counts = (~np.isnan(resampled)).sum(axis=1)
+    sums = np.nansum(resampled, axis=1)
+    return np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+
+
+def percentile_bands(samples: np.ndarray, percentiles=(2.5, 50, 97.5)) -> np.ndarray:
+    """Percentiles of the resampled values along the resample axis, one row per percentile.
+
+    NaN samples are skipped, values without any sample are NaN.
+    """
+    flat = samples.reshape(samples.shape[0], -1)
+    bands = np.full((len(percentiles), flat.shape[1]), np.nan)
+    valid = ~np.isnan(flat).all(axis=0)
+    if valid.any():
+        bands[:, valid] = np.nanpercentile(flat[:, valid], percentiles, axis=0)
+    return bands.reshape((len(percentiles),) + samples.shape[1:])
+
+
+def ratio_distribution(year_total: float, samples: np.ndarray) -> np.ndarray:
+    """Distribution of the ratio of a yearly total to the resampled annual normals.
+
+    Resamples missing a month have no annual normal and are NaN, as are zero normals.
+    """
+    annual_normals = samples.sum(axis=1)
+    return np.divide(year_total, annual_normals, out=np.full(annual_normals.shape, np.nan), where=annual_normals > 0)
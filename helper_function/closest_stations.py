@@ -1,14 +1,19 @@
-import streamlit as st
 from wetterdienst.provider.dwd.observation import (
     DwdObservationRequest,
     DwdObservationResolution,
     DwdObservationDataset
 )
 import polars as pl
+from helper_function.shared_cache import shared_cache
+from helper_function.single_flight import single_flight
 
-@st.cache_data
-def get_closest_stations(plz_coordinates, start_date, end_date, num_stations):
-    """Get the closest weather stations to the given coordinates"""
+# Upper bound of the "Anzahl an Stationen" slider, candidates are fetched once for this many stations
+MAX_STATIONS = 10
+
+@single_flight
+@shared_cache()
+def get_candidate_stations(plz_coordinates, start_date, end_date):
+    """Get the MAX_STATIONS closest weather stations to the given coordinates, sorted by distance"""
     # Initialize the request for temperature data
     request = DwdObservationRequest(
         parameter=["TMK"],
@@ -33,8 +38,14 @@ def get_closest_stations(plz_coordinates, start_date, end_date, num_stations):
         (pl.col('end_date') >= end_date.date())
     )
 
-    # Sort by distance and get the closest stations
-    closest_stations_df = filtered_stations_df.sort("distance").head(num_stations)
+    # Sort by distance and keep the candidates for the largest possible selection
+    return filtered_stations_df.sort("distance").head(MAX_STATIONS)
+
+
+def get_closest_stations(plz_coordinates, start_date, end_date, num_stations):
+    """Get the closest weather stations to the given coordinates"""
+    # Slice the cached candidates, so changing num_stations does not refetch
+    closest_stations_df = get_candidate_stations(plz_coordinates, start_date, end_date).head(num_stations)
 
     # Calculate distances and weights
     distances = closest_stations_df["distance"].to_numpy()
@@ -51,4 +62,4 @@ def get_closest_stations(plz_coordinates, start_date, end_date, num_stations):
         pl.Series("weights", weights)
     ])
 
-    return closest_stations_df
\ No newline at end of file
+    return closest_stations_df
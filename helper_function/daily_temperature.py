@@ -1,11 +1,14 @@
 from wetterdienst.provider.dwd.observation import DwdObservationRequest
 import polars as pl
-import streamlit as st
+from helper_function.shared_cache import shared_cache
+from helper_function.single_flight import single_flight
+from helper_function.usage import record_usage
 from wetterdienst import Parameter, Resolution
 
-@st.cache_data
-def get_daily_temperature(station_df, station_ids, start_date, end_date):
-    """Retrieve and calculate the daily temperature from the closest stations"""
+@single_flight
+@shared_cache()
+def get_daily_temperature_matrix(station_ids, start_date, end_date):
+    """Retrieve the daily temperature in °C as a date x station matrix, one column per station_id"""
 
     # Initialize the request for daily temperature data
     request = DwdObservationRequest(
@@ -17,24 +20,56 @@ def get_daily_temperature(station_df, station_ids, start_date, end_date):
     # Filter by station IDs
     daily_data_result = request.filter_by_station_id(station_id=station_ids)
     daily_data = daily_data_result.values.all().df.drop_nulls()  # Ensure `df` is a DataFrame
-    
+
     # Convert the temperature from Kelvin to Celsius
-    daily_data = daily_data.with_columns(
+    daily_data = daily_data.select(
+        pl.col("date"),
+        pl.col("station_id"),
         (pl.col("value") - 273.15).alias("temperature")  # Conversion from Kelvin to Celsius
     )
 
-    # Convert station_df to a DataFrame and rename columns for clarity
+    # Pivot to one temperature column per station
+    return daily_data.pivot(on="station_id", index="date", values="temperature").sort("date")
+
+
+def get_daily_temperature(station_df, station_ids, start_date, end_date):
+    """Retrieve and calculate the weighted daily temperature from the closest stations.
+
+    `station_ids` are the candidate stations fetched into the matrix, the stations and
+    weights in `station_df` select the subset that is averaged.
+    """
+    record_usage("daily", tuple(station_ids), start_date, end_date)
+    daily_matrix = get_daily_temperature_matrix(tuple(station_ids), start_date, end_date)
+
+    return weighted_station_mean(daily_matrix, station_df)
+
+
+def weighted_station_mean(matrix, station_df):
+    """Weighted mean over the station columns of a date x station matrix, as date and weighted_temperature.
+
+    The stations and weights in `station_df` select the columns that are averaged.
+    """
+    # Weights of the selected stations that have observations in the matrix
     station_df = pl.DataFrame(station_df)
-    
-    # Join `daily_data` with `station_df` on 'station_id'
-    daily_data = daily_data.join(station_df, on="station_id")
+    weights = {
+        station_id: weight
+        for station_id, weight in zip(station_df["station_id"], station_df["weights"])
+        if station_id in matrix.columns
+    }
+    if not weights:
+        return pl.DataFrame(schema={"date": matrix.schema["date"], "weighted_temperature": pl.Float64})
 
-    # Calculate weighted temperatures
-    daily_data = daily_data.with_columns(
-        (pl.col("temperature") * pl.col("weights")).alias("weighted_temperature")
+    # Calculate weighted temperatures, dropping dates without any observation of the selected stations.
+    # Weights are renormalized over the stations reporting at a date, so missing stations do not bias towards 0 °C
+    weighted_avg = matrix.filter(
+        pl.any_horizontal(pl.col(list(weights)).is_not_null())
+    ).select(
+        pl.col("date"),
+        (
+            pl.sum_horizontal(pl.col(station_id) * weight for station_id, weight in weights.items())
+            / pl.sum_horizontal(pl.col(station_id).is_not_null() * weight for station_id, weight in weights.items())
+        ).alias("weighted_temperature")
     )
 
     # Sort the aggregated results by date
-    daily_avg_sorted = daily_data.sort("date")
-    
-    return daily_avg_sorted
\ No newline at end of file
+    return weighted_avg.sort("date")
@@ -4,7 +4,9 @@ from wetterdienst.provider.dwd.observation import (
     DwdObservationResolution,
     DwdObservationDataset
 )
+from helper_function.single_flight import single_flight
 
+@single_flight
 def get_lat_lon_from_nominatim(address):
     """Get latitude and longitude from OpenStreetMap Nominatim API."""
     endpoint = "https://nominatim.openstreetmap.org/search"
@@ -1,51 +1,43 @@
 from wetterdienst.provider.dwd.observation import DwdObservationRequest
 import polars as pl
-import streamlit as st
+from helper_function.daily_temperature import weighted_station_mean
+from helper_function.shared_cache import shared_cache
+from helper_function.single_flight import single_flight
 from wetterdienst import Parameter, Resolution
 
-def get_hourly_temperature(stations_df, start_date, end_date):
-    """Retrieve and calculate the hourly temperature from the closest stations"""
+@single_flight
+@shared_cache()
+def get_hourly_temperature_matrix(station_ids, start_date, end_date):
+    """Retrieve the hourly temperature in °C as a date x station matrix, one column per station_id"""
 
     # Initialize the request for hourly temperature data
     request = DwdObservationRequest(
-        parameter=Parameter.TEMPERATURE_AIR_MEAN_200,
+        parameter=Parameter.TEMPERATURE_AIR_MEAN_2M,
         resolution=Resolution.HOURLY,
         start_date=start_date,
         end_date=end_date
     )
 
     # Filter by station IDs
-    station_ids =  st.session_state.get('station_ids')
     hourly_data_result = request.filter_by_station_id(station_id=station_ids)
     hourly_data = hourly_data_result.values.all().df.drop_nulls()
 
     # Convert the temperature from Kelvin to Celsius
-    hourly_data = hourly_data.with_columns(
-        (pl.col("value") - 273.15).alias("temperature_C")  # Conversion if in Kelvin
-    )
-
-    # Join weights with the hourly data based on station_id
-    hourly_data = hourly_data.join(stations_df, on="station_id")
-
-    # Calculate weighted temperatures
-    hourly_data = hourly_data.with_columns(
-        (pl.col("temperature_C") * pl.col("weights")).alias("weighted_temperature")
-    )
-
-    # Create a new DataFrame with date, weighted temperature
-    new_hourly_data = hourly_data.select(
+    hourly_data = hourly_data.select(
         pl.col("date"),
-        pl.col("value"),
-        pl.col("temperature_C"),
-        pl.col("weighted_temperature")
+        pl.col("station_id"),
+        (pl.col("value") - 273.15).alias("temperature")  # Conversion from Kelvin to Celsius
     )
 
-   # Aggregate weighted temperatures by date
-    hourly_avg = new_hourly_data.group_by("date").agg(
-        pl.col("weighted_temperature").sum().alias("average_temperature")
-    )
+    # Pivot to one temperature column per station
+    return hourly_data.pivot(on="station_id", index="date", values="temperature").sort("date")
+
 
-   # Sort the aggregated results by date
-    hourly_avg_sorted = hourly_avg.sort("date")
+def get_hourly_temperature(station_df, station_ids, start_date, end_date):
+    """Retrieve and calculate the weighted hourly temperature from the closest stations.
 
-    return hourly_avg_sorted
+    Same weighting as `get_daily_temperature`: `station_ids` are the candidate stations
+    fetched into the matrix, `station_df` selects the averaged subset and its weights.
+    """
+    hourly_matrix = get_hourly_temperature_matrix(tuple(station_ids), start_date, end_date)
+    return weighted_station_mean(hourly_matrix, station_df)
@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+from typing import Callable
+
+import polars as pl
+
+# Default parameters passed to every indicator expression
+DEFAULT_PARAMETERS = {
+    "heating_indoor_temperature": 20.0,
+    "heating_limit": 15.0,
+    "hdd_base": 18.0,
+    "cdd_base": 18.0,
+}
+
+
+@dataclass(frozen=True)
+class Indicator:
+    """A temperature indicator aggregated per period.
+
+    `expression` builds the aggregation from the temperature column and the parameters,
+    `resolution` is the resolution of the frame it is evaluated on ("daily" or "hourly").
+    """
+    name: str
+    label: str
+    resolution: str
+    expression: Callable[[pl.Expr, dict], pl.Expr]
+
+
+INDICATORS: dict[str, Indicator] = {}
+
+
+def register_indicator(name: str, label: str, resolution: str = "daily"):
+    """Register an indicator expression under the given name."""
+    def decorator(expression: Callable[[pl.Expr, dict], pl.Expr]) -> Callable[[pl.Expr, dict], pl.Expr]:
+        INDICATORS[name] = Indicator(name=name, label=label, resolution=resolution, expression=expression)
+        return expression
+    return decorator
+
+
+@register_indicator("gtz", "Gradtagzahl")
+def _gtz(temperature: pl.Expr, params: dict) -> pl.Expr:
+    # VDI 3807: indoor minus outdoor temperature on days below the heating limit
+    return (
+        pl.when(temperature < params["heating_limit"])
+        .then(params["heating_indoor_temperature"] - temperature)
+        .otherwise(0)
+        .sum()
+    )
+
+
+@register_indicator("heating_days", "Heiztage")
+def _heating_days(temperature: pl.Expr, params: dict) -> pl.Expr:
+    return (temperature < params["heating_limit"]).sum()
+
+
+@register_indicator("days", "Tage")
+def _days(temperature: pl.Expr, params: dict) -> pl.Expr:
+    return temperature.count()
+
+
+@register_indicator("avg_temperature", "Außentemperatur")
+def _avg_temperature(temperature: pl.Expr, params: dict) -> pl.Expr:
+    return temperature.mean()
+
+
+@register_indicator("avg_temperature_heating_days", "Außentemperatur an Heiztagen")
+def _avg_temperature_heating_days(temperature: pl.Expr, params: dict) -> pl.Expr:
+    return temperature.filter(temperature < params["heating_limit"]).mean()
+
+
+@register_indicator("hdd", "Heizgradtage")
+def _hdd(temperature: pl.Expr, params: dict) -> pl.Expr:
+    return (params["hdd_base"] - temperature).clip(lower_bound=0).sum()
+
+
+@register_indicator("cdd", "Kühlgradtage")
+def _cdd(temperature: pl.Expr, params: dict) -> pl.Expr:
+    return (temperature - params["cdd_base"]).clip(lower_bound=0).sum()
+
+
+@register_indicator("days_mean_below_zero", "Tage mit Tagesmittel unter 0 °C")
+def _days_mean_below_zero(temperature: pl.Expr, params: dict) -> pl.Expr:
+    # Not frost days (minimum below 0 °C), only the daily mean is fetched
+    return (temperature < 0).sum()
+
+
+@register_indicator("heating_degree_hours", "Heizgradstunden", resolution="hourly")
+def _heating_degree_hours(temperature: pl.Expr, params: dict) -> pl.Expr:
+    return (params["hdd_base"] - temperature).clip(lower_bound=0).sum()
+
+
+@register_indicator("cooling_degree_hours", "Kühlgradstunden", resolution="hourly")
+def _cooling_degree_hours(temperature: pl.Expr, params: dict) -> pl.Expr:
+    return (temperature - params["cdd_base"]).clip(lower_bound=0).sum()
+
+
+def compute_indicators(
+    df: pl.DataFrame,
+    resolution: str = "daily",
+    every: str = "1mo",
+    names: list[str] | None = None,
+    temperature_column: str = "weighted_temperature",
+    **params,
+) -> pl.DataFrame:
+    """Evaluate all indicators of a resolution in a single aggregation over `df`.
+
+    Returns one row per period (`every`, e.g. "1mo" or "1y") with one column per indicator.
+    """
+    params = {**DEFAULT_PARAMETERS, **params}
+    indicators = [
+        indicator for name, indicator in INDICATORS.items()
+        if indicator.resolution == resolution and (names is None or name in names)
+    ]
+
+    temperature = pl.col(temperature_column)
+    return (
+        df.lazy()
+        .group_by(pl.col("date").dt.truncate(every).cast(pl.Date).alias("date"))
+        .agg([indicator.expression(temperature, params).alias(indicator.name) for indicator in indicators])
+        .sort("date")
+        .collect()
+    )
+
+
+def compute_indicator_table(
+    daily_df: pl.DataFrame,
+    hourly_df: pl.DataFrame | None = None,
+    every: str = "1mo",
+    names: list[str] | None = None,
+    **params,
+) -> pl.DataFrame:
+    """Evaluate the daily and (optionally) hourly indicators and join them into one wide table."""
+    table = compute_indicators(daily_df, "daily", every, names, **params)
+    if hourly_df is not None:
+        hourly_table = compute_indicators(hourly_df, "hourly", every, names, **params)
+        table = table.join(hourly_table, on="date", how="full", coalesce=True).sort("date")
+    return table
@@ -0,0 +1,96 @@
+import os
+import shutil
+import uuid
+import weakref
+from pathlib import Path
+from typing import Callable
+
+import polars as pl
+import streamlit as st
+
+from helper_function.shared_cache import CACHE_DIR
+
+# Memory a session may hold in data frames before they are spilled to Parquet
+SESSION_MEMORY_BUDGET = int(os.getenv("DWD_SESSION_MEMORY_BUDGET_MB", 256)) * 2**20
+SPILL_DIR = CACHE_DIR / "spill"
+
+
+class SessionMemory:
+    """Accounts the frames a session holds and spills them to local Parquet files over the budget."""
+
+    def __init__(self, budget: int = SESSION_MEMORY_BUDGET):
+        self.budget = budget
+        self.held: dict[str, int] = {}
+        # Key of the data each spill directory was written for
+        self.spilled: dict[str, object] = {}
+        self.spill_dir = SPILL_DIR / uuid.uuid4().hex
+        # Remove the spilled files once the session state is gone
+        weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+
+    @property
+    def used(self) -> int:
+        return sum(self.held.values())
+
+    def spill_path(self, name: str) -> Path:
+        """Directory of the Parquet files spilled under `name`."""
+        return self.spill_dir / name
+
+    def spill(self, name: str, write: Callable[[Path], None], key=None) -> pl.LazyFrame:
+        """Spill a frame as Parquet files written by `write(directory)`, returns a lazy scan of them.
+
+        The files are kept if they were written for the same `key`, else rewritten.
+        """
+        self.release(name)
+        directory = self.spill_path(name)
+        if key is None or self.spilled.get(name) != key:
+            self.spilled.pop(name, None)
+            shutil.rmtree(directory, ignore_errors=True)
+            directory.mkdir(parents=True)
+            write(directory)
+            self.spilled[name] = key
+        return pl.scan_parquet(directory / "*.parquet")
+
+    def hold(self, name: str, df: pl.DataFrame, key=None) -> pl.DataFrame | pl.LazyFrame:
+        """Keep `df` in memory if it fits the budget, else spill it and return a lazy scan of the file."""
+        self.release(name)
+        size = df.estimated_size()
+        if self.used + size <= self.budget:
+            self.held[name] = size
+            return df
+        return self.spill(name, lambda directory: df.write_parquet(directory / "0.parquet"), key)
+
+    def hold_files(self, name: str, paths: list[Path]) -> pl.DataFrame | pl.LazyFrame:
+        """Frames cached in uncompressed Arrow IPC files, concatenated.
+
+        Sized by the files before anything is read: within the budget they are memory-mapped,
+        else converted file by file to Parquet, so at most one file is mapped at a time.
+        """
+        self.release(name)
+        if not paths:
+            return pl.DataFrame()
+        size = sum(path.stat().st_size for path in paths)
+        if self.used + size <= self.budget:
+            self.held[name] = size
+            return pl.concat([pl.read_ipc(path, memory_map=True) for path in paths], how="diagonal_relaxed")
+
+        def write(directory: Path):
+            # Every part gets the common schema, so the parts scan as one frame
+            schema = pl.concat([pl.DataFrame(schema=pl.read_ipc_schema(path)) for path in paths], how="diagonal_relaxed").schema
+            for i, path in enumerate(paths):
+                part = pl.concat([pl.DataFrame(schema=schema), pl.read_ipc(path, memory_map=True)], how="diagonal_relaxed")
+                part.write_parquet(directory / f"{i}.parquet")
+
+        # Cache files are replaced, not modified, when refetched
+        key = tuple((str(path), path.stat().st_mtime_ns) for path in paths)
+        return self.spill(name, write, key)
+
+    def release(self, name: str):
+        """Stop accounting the frame held under `name`."""
+        self.held.pop(name, None)
+
+
+def session_memory() -> SessionMemory:
+    """The memory accounting of the current session."""
+    if "session_memory" not in st.session_state:
+        st.session_state.session_memory = SessionMemory()
+    return st.session_state.session_memory
@@ -0,0 +1,89 @@
+import datetime as dt
+import logging
+import os
+import threading
+import time
+
+import streamlit as st
+
+from helper_function.daily_temperature import get_daily_temperature_matrix
+from helper_function.shared_cache import CACHE_DIR, cache_path, read_cached
+from helper_function.single_flight import file_lock
+from helper_function.usage import flush_usage, load_usage
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.getenv("DWD_PREWARM", "true").lower() == "true"
+# Local hour of the day the prewarm job runs, off-peak
+PREWARM_HOUR = int(os.getenv("DWD_PREWARM_HOUR", 3))
+# Number of most used fetches to warm
+PREWARM_TOP_N = int(os.getenv("DWD_PREWARM_TOP_N", 300))
+# Budget per run in seconds and in MB of cache files written (not downloaded bytes, the archives are larger)
+PREWARM_TIME_BUDGET = float(os.getenv("DWD_PREWARM_TIME_BUDGET", 30 * 60))
+PREWARM_CACHE_BUDGET = int(os.getenv("DWD_PREWARM_CACHE_BUDGET_MB", 2048)) * 2**20
+
+# Fetch functions by the usage kind recorded for them. Station lookups are keyed by the
+# user's coordinates, which are not recorded, the observations of their candidates are.
+FETCHERS = {
+    "daily": get_daily_temperature_matrix,
+}
+
+
+def prewarm(top_n: int = PREWARM_TOP_N, time_budget: float = PREWARM_TIME_BUDGET, cache_budget: int = PREWARM_CACHE_BUDGET) -> dict:
+    """Fetch the observation windows of the most used candidate station sets that are not cached.
+
+    Stops when the time budget or the budget of written cache files is used up. GTZ tables are derived from the
+    cached observations in milliseconds, so only the downloads are warmed.
+    """
+    flush_usage()
+    deadline = time.monotonic() + time_budget
+    stats = {"warm": 0, "fetched": 0, "failed": 0, "cache_bytes": 0}
+    for (kind, args), _ in load_usage().most_common(top_n):
+        if time.monotonic() > deadline or stats["cache_bytes"] > cache_budget:
+            break
+        fetcher = FETCHERS.get(kind)
+        if fetcher is None:
+            continue
+        path = cache_path(fetcher, args)
+        if read_cached(path) is not None:
+            stats["warm"] += 1
+            continue
+        try:
+            fetcher(*args)
+            stats["cache_bytes"] += path.stat().st_size
+            stats["fetched"] += 1
+        except Exception:
+            logger.exception("Prewarming %s%s failed", kind, args)
+            stats["failed"] += 1
+    return stats
+
+
+def _seconds_until(hour: int) -> float:
+    now = dt.datetime.now()
+    next_run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += dt.timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def _run_scheduler():
+    while True:
+        time.sleep(_seconds_until(PREWARM_HOUR))
+        try:
+            # Only one worker process on this host prewarms
+            with file_lock(CACHE_DIR / "prewarm.lock", blocking=False):
+                logger.info("Prewarm finished: %s", prewarm())
+        except BlockingIOError:
+            pass
+        except Exception:
+            logger.exception("Prewarm failed")
+
+
+@st.cache_resource
+def start_prewarm_scheduler():
+    """Start the daily prewarm job once per process."""
+    if not PREWARM_ENABLED:
+        return None
+    thread = threading.Thread(target=_run_scheduler, name="dwd-prewarm", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,154 @@
+import datetime as dt
+import functools
+import hashlib
+import inspect
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import polars as pl
+
+from helper_function.single_flight import FILE_LOCK, FLIGHTS, file_lock
+
+# Directory shared by all Streamlit worker processes on this host
+CACHE_DIR = Path(os.getenv("DWD_CACHE_DIR", Path(tempfile.gettempdir()) / "dwdweather-cache"))
+# Seconds until a cached file is refetched (DWD publishes recent observations daily)
+CACHE_TTL = int(os.getenv("DWD_CACHE_TTL", 24 * 60 * 60))
+# Size cap of the cache files, the oldest are evicted first
+CACHE_MAX_SIZE = int(os.getenv("DWD_CACHE_MAX_SIZE_MB", 4096)) * 2**20
+# Seconds between evictions run by one process
+EVICT_INTERVAL = 10 * 60
+
+_last_eviction = 0.0
+
+
+def cache_path(func, args: tuple) -> Path:
+    """Path of the IPC file caching `func(*args)`."""
+    # Datetimes by their ISO format, so pytz and datetime.timezone UTC share a key
+    args = tuple(arg.isoformat() if isinstance(arg, dt.datetime) else arg for arg in args)
+    key = hashlib.sha256(repr(args).encode()).hexdigest()
+    return CACHE_DIR / f"{func.__module__}.{func.__qualname__}" / f"{key}.arrow"
+
+
+def read_cached(path: Path, ttl: int = CACHE_TTL) -> pl.DataFrame | None:
+    """Memory-map a cached frame read-only, None if it is missing or older than `ttl`."""
+    try:
+        if time.time() - path.stat().st_mtime > ttl:
+            return None
+        return pl.read_ipc(path, memory_map=True)
+    except (FileNotFoundError, OSError):
+        return None
+
+
+def publish(path: Path, df: pl.DataFrame) -> bool:
+    """Atomically publish `df` at `path`, readers see either the old or the new file.
+
+    Returns False if the old file could not be replaced: on Windows a file memory-mapped by
+    another process is locked, it is replaced by a later publish.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # Uncompressed, so the file can be memory-mapped without decoding
+            df.write_ipc(f, compression="uncompressed")
+        os.replace(tmp_path, path)
+    except PermissionError:
+        os.unlink(tmp_path)
+        return False
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    maybe_evict()
+    return True
+
+
+def _unlink(path: Path) -> bool:
+    # Processes that mapped the file keep reading it, it is only removed from the directory.
+    # On Windows a mapped file cannot be removed, it is retried at the next eviction
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        return False
+    return True
+
+
+def evict(ttl: int = CACHE_TTL, max_size: int = CACHE_MAX_SIZE) -> None:
+    """Remove expired cache files, stale temporary and lock files, then the oldest files over `max_size`."""
+    now = time.time()
+    entries = []
+    for path in CACHE_DIR.glob("*/*"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        age = now - stat.st_mtime
+        if path.suffix == ".arrow":
+            if age > ttl:
+                _unlink(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        elif path.suffix == ".lock" and age > ttl and not path.with_suffix(".arrow").exists():
+            _unlink(path)
+        elif path.suffix == ".tmp" and age > 60 * 60:
+            # Left behind by a process killed while publishing
+            _unlink(path)
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        if _unlink(path):
+            total_size -= size
+
+
+def maybe_evict() -> None:
+    """Run `evict` at most every EVICT_INTERVAL seconds per process."""
+    global _last_eviction
+    if time.monotonic() - _last_eviction < EVICT_INTERVAL:
+        return
+    _last_eviction = time.monotonic()
+    evict()
+
+
+def shared_cache(ttl: int = CACHE_TTL):
+    """Cache a function returning a polars DataFrame as memory-mapped Arrow IPC files.
+
+    Unlike `st.cache_data`, the cache lives once in the OS page cache and is shared
+    by every worker process using the same CACHE_DIR. Arguments must have a stable `repr`.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # Keyword and default arguments by position, so all call styles share a cache file
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            args = bound.args
+            path = cache_path(func, args)
+            df = read_cached(path, ttl)
+            if df is not None:
+                return df
+
+            if FILE_LOCK:
+                with file_lock(path.with_suffix(".lock")):
+                    # Another process may have published while we waited for the lock
+                    df = read_cached(path, ttl)
+                    if df is not None:
+                        FLIGHTS.record_cross_process()
+                        return df
+                    df = func(*args)
+                    published = publish(path, df)
+            else:
+                df = func(*args)
+                published = publish(path, df)
+            if not published:
+                return df
+            # Return the mapped file, so the freshly fetched frame is not kept on the heap
+            return pl.read_ipc(path, memory_map=True)
+        return wrapper
+    return decorator
@@ -1,12 +1,15 @@
 import streamlit as st
 import datetime as dt
 from helper_function.get_coord_from_nominatim import get_lat_lon_from_nominatim
-from helper_function.closest_stations import get_closest_stations
+from helper_function.closest_stations import get_candidate_stations, get_closest_stations
+from helper_function.prewarm import start_prewarm_scheduler
 # Input for location
 
 
 def sidebar():
 
+    start_prewarm_scheduler()
+
     st.title("Einstellungen")
     location = st.text_input("Ort", value=st.session_state.location)
     try:
@@ -44,3 +47,6 @@ def sidebar():
     # Save station IDs to session state
     st.session_state.closest_stations_df = closest_stations_df
     st.session_state.station_ids = closest_stations[['station_id']].to_pandas()['station_id'].tolist()
+    # Save candidate station IDs, observations are fetched once for all of them
+    candidate_stations = get_candidate_stations(st.session_state.point_coordinates, st.session_state.start_date, st.session_state.end_date)
+    st.session_state.candidate_station_ids = candidate_stations['station_id'].to_list()
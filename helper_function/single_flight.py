@@ -0,0 +1,94 @@
+import contextlib
+import functools
+import os
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+# Also coalesce fetches across worker processes by locking the shared cache file
+FILE_LOCK = os.getenv("DWD_SINGLE_FLIGHT_FILE_LOCK", "false").lower() == "true"
+
+
+class SingleFlight:
+    """Registry of in-flight calls, concurrent callers with the same key share one result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: dict = {}
+        self._stats = {"calls": 0, "executed": 0, "coalesced": 0, "coalesced_cross_process": 0}
+
+    def do(self, key, func, *args, **kwargs):
+        """Run `func(*args, **kwargs)` unless a call with `key` is in flight, then wait for its result."""
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self._stats["executed"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def record_cross_process(self):
+        """Count a fetch that was served by another process while waiting on its file lock."""
+        with self._lock:
+            self._stats["coalesced_cross_process"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+
+# Process-wide registry used by the fetch functions
+FLIGHTS = SingleFlight()
+
+
+def single_flight(func):
+    """Deduplicate concurrent calls of `func` with identical (hashable) arguments."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())))
+        return FLIGHTS.do(key, func, *args, **kwargs)
+    return wrapper
+
+
+def single_flight_stats() -> dict:
+    """Number of calls, executed calls and calls coalesced into an in-flight one."""
+    return FLIGHTS.stats()
+
+
+@contextlib.contextmanager
+def file_lock(path: Path, blocking: bool = True):
+    """Exclusive lock on `path` shared by all processes on this host.
+
+    Raises BlockingIOError if `blocking` is False and another process holds the lock.
+    Without fcntl (Windows) nothing is locked, processes may then fetch the same data twice.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,88 @@
+import atexit
+import datetime as dt
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from helper_function.shared_cache import CACHE_DIR
+
+# Per-process usage counts, merged by the prewarm job
+USAGE_DIR = CACHE_DIR / "usage"
+# Seconds between writes of the usage counts
+USAGE_FLUSH_INTERVAL = 60
+# Usage files of processes that stopped longer ago are ignored
+USAGE_MAX_AGE = int(os.getenv("DWD_USAGE_MAX_AGE_DAYS", 30)) * 24 * 60 * 60
+
+_usage = Counter()
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _encode(arg):
+    if isinstance(arg, dt.datetime):
+        return {"datetime": arg.isoformat()}
+    if isinstance(arg, (list, tuple)):
+        return [_encode(a) for a in arg]
+    return arg
+
+
+def _decode(arg):
+    if isinstance(arg, dict):
+        return dt.datetime.fromisoformat(arg["datetime"])
+    if isinstance(arg, list):
+        return tuple(_decode(a) for a in arg)
+    return arg
+
+
+def record_usage(kind: str, *args):
+    """Count a fetch of `kind` with the given arguments.
+
+    Only station sets and date windows are recorded, never the coordinates or the
+    address a user typed.
+    """
+    global _last_flush
+    key = json.dumps([kind, _encode(args)])
+    with _lock:
+        _usage[key] += 1
+        flush = time.monotonic() - _last_flush > USAGE_FLUSH_INTERVAL
+        if flush:
+            _last_flush = time.monotonic()
+    if flush:
+        flush_usage()
+
+
+def flush_usage():
+    """Atomically write this process's usage counts."""
+    with _lock:
+        counts = dict(_usage)
+    if not counts:
+        return
+    USAGE_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=USAGE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(counts, f)
+    os.replace(tmp_path, USAGE_DIR / f"{socket.gethostname()}-{os.getpid()}.json")
+
+
+atexit.register(flush_usage)
+
+
+def load_usage() -> Counter:
+    """Usage counts of all processes as {(kind, args): count}."""
+    counts = Counter()
+    for path in USAGE_DIR.glob("*.json"):
+        try:
+            if time.time() - path.stat().st_mtime > USAGE_MAX_AGE:
+                continue
+            with open(path) as f:
+                process_counts = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for key, count in process_counts.items():
+            kind, args = json.loads(key)
+            counts[(kind, _decode(args))] += count
+    return counts
@@ -4,29 +4,25 @@ from __future__ import annotations
 import datetime as dt
 
 import os
+import tempfile
+from pathlib import Path
 
 import duckdb
 import plotly.express as px
 import polars as pl
 import streamlit as st
 
-from wetterdienst import Resolution, Settings, Wetterdienst, __version__
+from wetterdienst import Settings, Wetterdienst, __version__
 from wetterdienst.api import RequestRegistry
 from wetterdienst.metadata.period import PeriodType
 
+from helper_function.memory_budget import session_memory
+from helper_function.shared_cache import cache_path, publish, read_cached, shared_cache
 from helper_function.sidbar import sidebar
-# this env is set manually on streamlit.com
-LIVE = os.getenv("LIVE", "false").lower() == "true"
-
-SUBDAILY_AT_MOST = [
-    Resolution.MINUTE_1.value,
-    Resolution.MINUTE_5.value,
-    Resolution.MINUTE_10.value,
-    Resolution.MINUTE_15.value,
-    Resolution.HOURLY.value,
-    Resolution.HOUR_6.value,
-    Resolution.SUBDAILY.value,
-]
+
+# Rows shown in the table and points plotted for a dataset spilled to disk
+MAX_PREVIEW_ROWS = 10_000
+MAX_PLOT_POINTS = 200_000
 
 SQL_DEFAULT = """
 SELECT date, value, parameter
@@ -35,30 +31,81 @@ WHERE parameter IS NOT NULL
 """.strip()
 
 
-@st.cache_data
-def get_stations(provider: str, network: str, request_kwargs: dict):
+@shared_cache()
+def get_stations(provider: str, network: str, request_kwargs: dict, station_ids: tuple[str, ...]):
     request_kwargs = request_kwargs.copy()
     request_kwargs["settings"] = Settings(**request_kwargs["settings"])
-    return Wetterdienst(provider, network)(**request_kwargs).all()
+    request = Wetterdienst(provider, network)(**request_kwargs)
+    # Only the selected stations are kept and cached, wetterdienst still parses the network's whole station list
+    if station_ids:
+        return request.filter_by_station_id(station_ids).df
+    return request.all().df
 
 
-@st.cache_data
-def get_station(provider: str, network: str, request_kwargs: dict, station_id: str):
+def get_values(provider: str, network: str, request_kwargs: dict, station_id: str):
+    """Values of one station for the parameters and date range in `request_kwargs`"""
     request_kwargs = request_kwargs.copy()
     request_kwargs["settings"] = Settings(**request_kwargs["settings"])
-    return Wetterdienst(provider, network)(**request_kwargs).filter_by_station_id(station_id)
+    values = Wetterdienst(provider, network)(**request_kwargs).filter_by_station_id(station_id).values.all().df
+    # Convert temperature_mean_2m from Kelvin to Celsius
+    return values.with_columns(
+        pl.when(pl.col("parameter") == "temperature_air_mean_2m")
+        .then(pl.col("value") - 273.15)
+        .otherwise(pl.col("value"))
+        .alias("value")
+    )
 
 
-@st.cache_data
-def get_values(provider: str, network: str, request_kwargs: dict, station_id: str):
-    request_kwargs = request_kwargs.copy()
-    settings = Settings(**request_kwargs["settings"])
-    request_kwargs["settings"] = settings
-    request_station = get_station(provider, network, request_kwargs, station_id)
-    units = request_station.discover("daily", "climate_summary")["daily"]
-    units = {parameter: (unit["si"] if settings.ts_si_units else unit["origin"]) for parameter, unit in units.items()}
-    values = request_station.values.all().df
-    return values.with_columns(pl.col("parameter").replace(units).alias("unit"))
+def year_ranges(start_date: dt.datetime, end_date: dt.datetime) -> list[tuple[dt.datetime, dt.datetime]]:
+    """The date range split at the turns of the year"""
+    return [
+        (max(start_date, dt.datetime(year, 1, 1)), min(end_date, dt.datetime.combine(dt.date(year, 12, 31), dt.time.max)))
+        for year in range(start_date.year, end_date.year + 1)
+    ]
+
+
+def cache_station_values(provider: str, network: str, request_kwargs: dict, station_id: str) -> list[Path]:
+    """Cache files with the values of one station, one per parameter and year.
+
+    Changing the selection only fetches new parameters and years, and at most one year of values is
+    loaded at a time, so high resolutions fit in memory.
+    """
+    paths = {parameter: [] for parameter in request_kwargs["parameter"]}
+    for start_date, end_date in year_ranges(request_kwargs["start_date"], request_kwargs["end_date"]):
+        year_kwargs = {**request_kwargs, "start_date": start_date, "end_date": end_date}
+        year_paths = {
+            parameter: cache_path(get_values, (provider, network, {**year_kwargs, "parameter": [parameter]}, station_id))
+            for parameter in paths
+        }
+        missing = [parameter for parameter, path in year_paths.items() if read_cached(path) is None]
+        if missing:
+            # One request for all missing parameters, so their common archive is downloaded and parsed once per year
+            values = get_values(provider, network, {**year_kwargs, "parameter": missing}, station_id)
+            for parameter in missing:
+                # A parameter is either a single parameter or a whole dataset
+                publish(year_paths[parameter], values.filter((pl.col("parameter") == parameter) | (pl.col("dataset") == parameter)))
+            # Released before the next year is fetched
+            del values
+        for parameter, path in year_paths.items():
+            paths[parameter].append(path)
+    return [path for parameter_paths in paths.values() for path in parameter_paths]
+
+
+def iso_strings(df: pl.DataFrame | pl.LazyFrame, *columns: str) -> pl.DataFrame | pl.LazyFrame:
+    """Date and datetime `columns` as isoformat() strings, other columns are left as they are.
+
+    Native polars formats: Python UDFs (map_elements) need the GIL on the polars thread pool
+    and deadlock with concurrent sessions.
+    """
+    schema = df.collect_schema()
+    formats = {}
+    for column in columns:
+        dtype = schema.get(column)
+        if dtype == pl.Date:
+            formats[column] = "%Y-%m-%d"
+        elif isinstance(dtype, pl.Datetime):
+            formats[column] = "%Y-%m-%dT%H:%M:%S%:z" if dtype.time_zone else "%Y-%m-%dT%H:%M:%S"
+    return df.with_columns(pl.col(column).dt.to_string(format) for column, format in formats.items())
 
 
 def create_plotly_fig(
@@ -71,9 +118,7 @@ def create_plotly_fig(
 ):
     if "unit" in df.columns:
         df = df.with_columns(
-            pl.struct(["parameter", "unit"])
-            .map_elements(lambda s: f"{s['parameter']} ({s['unit']})")
-            .alias("parameter"),
+            pl.format("{} ({})", "parameter", "unit").alias("parameter"),
         )
 
     fig = px.line(
@@ -127,12 +172,6 @@ resolution = st.selectbox(
     options=resolution_options,
     index=resolution_options.index("daily") if "daily" in resolution_options else 0,
 )
-# for hosted app, we disallow higher resolutions as the machine might not be able to handle it
-if LIVE:
-    if resolution in SUBDAILY_AT_MOST:
-        st.warning("Higher resolutions are disabled for hosted app. Choose at least daily resolution.")
-        st.stop()
-
 dataset_options = list(api.discover(flatten=False)[resolution].keys())
 dataset = st.selectbox(
     "Select dataset",
@@ -150,6 +189,9 @@ default_parameters = ["temperature_air_mean_2m", "humidity"]
 default_parameters = [param for param in default_parameters if param in parameter_options]
 
 parameters = st.multiselect("Select parameters", options=parameter_options, default=default_parameters)
+# The dataset includes all of its parameters, selecting both would fetch and show them twice
+if dataset in parameters:
+    parameters = [dataset]
 
 if api._period_type == PeriodType.FIXED:
     period = list(api._period_base)[0]
@@ -179,11 +221,13 @@ request_kwargs = {
 if api._period_type != PeriodType.FIXED:
     request_kwargs["period"] = period
 
-df_stations = get_stations(provider, network, request_kwargs).df
-# Filter the stations based on session state station IDs
-if "station_ids" in st.session_state:
-    station_ids = st.session_state.station_ids
-    df_stations = df_stations.filter(pl.col("station_id").is_in(station_ids))
+# Only request the stations selected in the sidebar
+station_ids = tuple(st.session_state.get("station_ids", []))
+if (provider, network, resolution, dataset) == ("DWD", "OBSERVATION", "daily", "climate_summary") and station_ids:
+    # The sidebar already holds these stations from the same station list
+    df_stations = pl.from_pandas(st.session_state.closest_stations_df).drop("distance", "weights")
+else:
+    df_stations = get_stations(provider, network, request_kwargs, station_ids)
 with st.expander("Map of all stations", expanded=False):
     st.map(df_stations, latitude="latitude", longitude="longitude")
 
@@ -194,37 +238,29 @@ station = st.selectbox(
     format_func=lambda s: f"{s['name']} [{s['station_id']}]",
 )
 df = pl.DataFrame()
+memory = session_memory()
 
 if station:
-    request_station = get_station(provider, network, request_kwargs, station["station_id"])
-    df = request_station.values.all().df
+    # A DataFrame within the session memory budget, else a LazyFrame scanning the spilled Parquet files
+    df = memory.hold_files("values", cache_station_values(provider, network, request_kwargs, station["station_id"]))
+    df_station = df_stations.filter(pl.col("station_id") == station["station_id"])
     station["start_date"] = station["start_date"].isoformat() if station["start_date"] else None
     station["end_date"] = station["end_date"].isoformat() if station["end_date"] else None
     with st.expander("Station JSON", expanded=False):
         st.json(station)
     with st.expander("Map of selected station", expanded=False):
-        st.map(request_station.df, latitude="latitude", longitude="longitude")
-
-    # Convert temperature_mean_2m from Kelvin to Celsius
-    if "temperature_air_mean_2m" in df["parameter"].to_list():
-        df = df.with_columns(
-            pl.when(pl.col("parameter") == "temperature_air_mean_2m")
-            .then(pl.col("value") - 273.15)
-            .otherwise(pl.col("value"))
-            .alias("value")
-        )
+        st.map(df_station, latitude="latitude", longitude="longitude")
 
 st.subheader("Values")
 df_stats = (
-    df.drop_nulls(["value"])
+    df.lazy()
+    .drop_nulls(["value"])
     .group_by(["parameter"])
     .agg(pl.count("value").alias("count"), pl.min("date").alias("min_date"), pl.max("date").alias("max_date"))
+    .collect()
 )
 df_stats = df_stats.sort("parameter")
-df_stats = df_stats.with_columns(
-    pl.col("min_date").map_elements(lambda d: d.isoformat()).alias("min_date"),
-    pl.col("max_date").map_elements(lambda d: d.isoformat()).alias("max_date"),
-)
+df_stats = iso_strings(df_stats, "min_date", "max_date")
 values_summary = df_stats.to_dicts()
 with st.expander("Stats JSON", expanded=False):
     st.json(values_summary)
@@ -243,24 +279,62 @@ sql_query = st.text_area(
 )
 if station:
     if sql_query:
-        df = duckdb.query(sql_query).pl()
+        if isinstance(df, pl.LazyFrame):
+            # Query the spilled files and write the result next to them without loading either
+            def write_result(directory):
+                # The default duckdb connection is shared by all sessions and not thread-safe
+                with duckdb.connect() as con:
+                    con.execute(f"CREATE VIEW df AS SELECT * FROM read_parquet('{memory.spill_path('values') / '*.parquet'}')")
+                    con.sql(sql_query).write_parquet(str(directory / "0.parquet"))
+
+            df = memory.spill("result", write_result, key=(memory.spilled["values"], sql_query))
+        else:
+            with duckdb.connect() as con:
+                df = memory.hold("result", con.sql(sql_query).pl())
     with st.expander("Datensatz", expanded=False):
-        st.dataframe(df, hide_index=True, use_container_width=True)
-    data_csv = df.write_csv()
+        if isinstance(df, pl.LazyFrame):
+            st.caption(f"Dataset exceeds the session memory budget, showing the first {MAX_PREVIEW_ROWS} rows.")
+            st.dataframe(df.head(MAX_PREVIEW_ROWS).collect(), hide_index=True, use_container_width=True)
+        else:
+            st.dataframe(df, hide_index=True, use_container_width=True)
+
+    def sink_bytes(sink, suffix):
+        # A file per click, so concurrent downloads do not overwrite each other
+        fd, path = tempfile.mkstemp(dir=memory.spill_dir, suffix=suffix)
+        os.close(fd)
+        try:
+            sink(path)
+            return Path(path).read_bytes()
+        finally:
+            os.unlink(path)
+
+    # Downloads are generated on click, so the serialized data is not held on every rerun
+    def data_csv(df=df):
+        if isinstance(df, pl.LazyFrame):
+            # Streamed from the spilled files, only the serialized bytes are loaded
+            return sink_bytes(df.sink_csv, ".csv")
+        return df.write_csv()
+
+    def data_json(df=df):
+        # The result of the sql query may have the date cast, formatted or not at all
+        df = iso_strings(df, "date")
+        if isinstance(df, pl.LazyFrame):
+            return sink_bytes(df.sink_ndjson, ".ndjson")
+        return df.write_json()
+
     st.download_button("Download CSV", data_csv, "data.csv", "text/csv")
-    data_json = df.with_columns(pl.col("date").map_elements(lambda d: d.isoformat(), return_dtype=pl.Utf8)).write_json()
     st.download_button(
         "Download JSON",
         data_json,
-        "data.json",
-        "text/json",
+        "data.ndjson" if isinstance(df, pl.LazyFrame) else "data.json",
+        "application/x-ndjson" if isinstance(df, pl.LazyFrame) else "text/json",
     )
 
 st.subheader("Plot")
-plot_enable = not df.is_empty()
+plot_enable = df.lazy().select(pl.len()).collect().item() > 0
 
 with st.expander("settings", expanded=False):
-    columns = sorted(df.columns)
+    columns = sorted(df.collect_schema().names())
     column_x = st.selectbox("Column X", options=columns, index="date" in columns and columns.index("date"))
     columns = columns.copy()
     columns.remove(column_x)
@@ -272,7 +346,7 @@ with st.expander("settings", expanded=False):
         options=columns,
         index="parameter" in columns and columns.index("parameter"),
     )
-    variable_options = df.get_column(variable_column).unique().sort().to_list()
+    variable_options = df.lazy().select(pl.col(variable_column).unique().sort()).collect().to_series().to_list()
 
     # Determine the default values for variable_filter
     st.write(len(variable_options))
@@ -294,5 +368,9 @@ if not plot_enable:
 elif not variable_filter:
     st.warning("No plot. Reason: empty variable filter")
 else:
+    if isinstance(df, pl.LazyFrame):
+        # Plot an evenly thinned sample of the spilled dataset
+        num_rows = df.select(pl.len()).collect().item()
+        df = df.select(list({column_x, column_y, variable_column})).gather_every(-(-num_rows // MAX_PLOT_POINTS)).collect()
     fig = create_plotly_fig(df, variable_column, variable_filter, column_x, column_y, facet)
     st.plotly_chart(fig)
@@ -1,10 +1,36 @@
 import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import streamlit as st
 import polars as pl
-from helper_function.daily_temperature import get_daily_temperature
-from helper_function.gradtagszahl_before_avg import calculate_gradtagzahl
+import plotly.graph_objects as go
+from helper_function.bootstrap import bootstrap_normals, gtz_year_month_matrix, percentile_bands, ratio_distribution
+from helper_function.daily_temperature import get_daily_temperature, get_daily_temperature_matrix
+from helper_function.gradtagszahl_before_avg import summarize_gradtagzahl
+from helper_function.hourly_temperature import get_hourly_temperature
+from helper_function.indicators import INDICATORS, compute_indicator_table
 from helper_function.sidbar import sidebar
 
+
+@st.cache_resource
+def reference_executor():
+    """Threads fetching the 20-year reference in the background, shared by all sessions"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="gtz-reference")
+
+
+def memoize(name, key, compute):
+    """Keep the last result of `compute` per session, so partial and full reruns do not recompute it"""
+    memo = st.session_state.setdefault("gradtagzahl_memo", {})
+    if name not in memo or memo[name][0] != key:
+        memo[name] = (key, compute())
+    return memo[name][1]
+
+
+def ratio(value, reference):
+    """value / reference with two decimals, "–" without a reference to compare to"""
+    return f"{value / reference:.2f}" if reference else "–"
+
+
 with st.sidebar:
         sidebar()
 
@@ -19,6 +45,7 @@ st.title("Gradtagzahlrechner")
 # set session states
 stations_df = st.session_state.closest_stations_df
 stations_ids = st.session_state.station_ids
+candidate_station_ids = st.session_state.candidate_station_ids
 
 with st.expander("Stationen", expanded=False):
     st.dataframe(stations_df[['station_id', 'name', 'distance', 'weights']])
@@ -37,11 +64,56 @@ end_date = dt.datetime(year, 12, 31)
 start_last_20_years = dt.datetime(2004, 1, 1)
 end_last_20_years = dt.datetime(2023, 12, 31)
 
+# Start downloading the reference period in the background, the selected year is rendered meanwhile
+reference_fetch_key = (tuple(candidate_station_ids), start_last_20_years, end_last_20_years)
+if st.session_state.get("reference_fetch", (None,))[0] != reference_fetch_key:
+    if "reference_fetch" in st.session_state:
+        # Drop the download for the previous stations if it has not started yet
+        st.session_state.reference_fetch[1].cancel()
+    st.session_state.reference_fetch = (
+        reference_fetch_key,
+        reference_executor().submit(get_daily_temperature_matrix, *reference_fetch_key),
+    )
+reference_future = st.session_state.reference_fetch[1]
+
+stations_key = (tuple(candidate_station_ids), tuple(zip(stations_df["station_id"], stations_df["weights"])))
+calculation_key = (stations_key, year, heating_indoor_temperature, heating_threshold)
+
+
+def calculate_monthly_indicators(daily_avg_temperatures, hourly_avg_temperatures=None):
+    # One fused aggregation per resolution for the GTZ statistics, the bootstrap matrix and the indicator table
+    return compute_indicator_table(
+        daily_avg_temperatures,
+        hourly_avg_temperatures,
+        heating_indoor_temperature=heating_indoor_temperature,
+        heating_limit=heating_threshold,
+    )
+
+
+def calculate_specific_year():
+    daily_avg_temperatures_specific_year = get_daily_temperature(stations_df, candidate_station_ids, start_date, end_date)
+    # Degree-hours only for the selected year, the 20-year reference is compared on daily data
+    hourly_avg_temperatures_specific_year = get_hourly_temperature(stations_df, candidate_station_ids, start_date, end_date.replace(hour=23))
+    indicator_table = calculate_monthly_indicators(daily_avg_temperatures_specific_year, hourly_avg_temperatures_specific_year)
+    gradtagzahl_df_specific_year = summarize_gradtagzahl(indicator_table)
+    _, gtz_matrix_specific_year = gtz_year_month_matrix(indicator_table, years=[year])
+    return gradtagzahl_df_specific_year, gtz_matrix_specific_year, indicator_table
+
+
+def calculate_last_20_years():
+    daily_avg_temperatures_last_20_years = get_daily_temperature(stations_df, candidate_station_ids, start_last_20_years, end_last_20_years)
+    monthly_indicators_last_20_years = calculate_monthly_indicators(daily_avg_temperatures_last_20_years)
+    gradtagzahl_last_20_years = summarize_gradtagzahl(monthly_indicators_last_20_years)
+    # Bootstrap the reference years for uncertainty bands of the monthly normals and the ratio
+    _, gtz_matrix_last_20_years = gtz_year_month_matrix(monthly_indicators_last_20_years)
+    gtz_normals_samples = bootstrap_normals(gtz_matrix_last_20_years)
+    gtz_normals_bands = percentile_bands(gtz_normals_samples)
+    gtz_ratio_band = percentile_bands(ratio_distribution(GTZ_specific_year, gtz_normals_samples))
+    return gradtagzahl_last_20_years, gtz_normals_bands, gtz_ratio_band
+
+
 # perform calculations
-daily_avg_temperatures_specific_year = get_daily_temperature(stations_df, stations_ids, start_date, end_date)
-daily_avg_temperatures_last_20_years = get_daily_temperature(stations_df, stations_ids, start_last_20_years, end_last_20_years)
-gradtagzahl_df_specific_year = calculate_gradtagzahl(daily_avg_temperatures_specific_year, heating_indoor_temperature, heating_threshold)
-gradtagzahl_last_20_years = calculate_gradtagzahl(daily_avg_temperatures_last_20_years, heating_indoor_temperature, heating_threshold)
+gradtagzahl_df_specific_year, gtz_matrix_specific_year, indicator_table = memoize("specific_year", calculation_key, calculate_specific_year)
 # Potsdam
 long = 52.4009309
 lat = 13.0591397
@@ -49,9 +121,6 @@ lat = 13.0591397
 GTZ_specific_year=gradtagzahl_df_specific_year["GTZ"].sum()
 heating_days_specific_year= gradtagzahl_df_specific_year["heating_days"].sum()
 
-GTZ_specific_last_20_years=gradtagzahl_last_20_years["GTZ"].sum()
-heating_days_specific_last_20_years= gradtagzahl_last_20_years["heating_days"].sum()
-
 # Rename the columns
 gradtagzahl_df_specific_year = gradtagzahl_df_specific_year.rename({
     "month": "Monat",
@@ -61,17 +130,6 @@ gradtagzahl_df_specific_year = gradtagzahl_df_specific_year.rename({
     "avg_monthly_temperature_on_heating_day": "Außentemperatur an Heiztagen"
 })
 
-# Rename the columns
-gradtagzahl_last_20_years = gradtagzahl_last_20_years.rename({
-    "month": "Monat",
-    "GTZ": f"GTZ {heating_indoor_temperature}/{heating_threshold} ",
-    "heating_days": "Heiztage",
-    "avg_monthly_temperature": "Außentemperatur",
-    "avg_monthly_temperature_on_heating_day": "Außentemperatur an Heiztagen"
-})
-
-st.metric(label=f"Verhältnis der Gradtagzahlen GTZ {heating_indoor_temperature}/{heating_threshold} für {year} zum 20-Jahres Mittel am gleichen Standort", value=f"{GTZ_specific_year/GTZ_specific_last_20_years:.2f}")
-st.metric(label=f"Verhältnis der Heiztage HT {heating_threshold} für {year} zum 20-Jahres Mittel am gleichen Standort", value=f"{heating_days_specific_year/heating_days_specific_last_20_years:.2f}")
 st.write(f"**GTZ für Jahr {year}**")
 st.write(start_date, " bis ", end_date)
 with st.expander(f"Statistik GTZ {heating_indoor_temperature}/{heating_threshold} für {year}", expanded=False):
@@ -79,11 +137,65 @@ with st.expander(f"Statistik GTZ {heating_indoor_temperature}/{heating_threshold
 col1, col2 = st.columns(2)
 col1.metric(label="Gradtagzahl ", value=GTZ_specific_year)
 col2.metric(label="Heiztage ", value=heating_days_specific_year)
+with st.expander(f"Weitere Kennzahlen für {year}", expanded=False):
+    st.dataframe(indicator_table.rename({name: indicator.label for name, indicator in INDICATORS.items() if name in indicator_table.columns} | {"date": "Datum"}))
 
-st.write(f"**GTZ 20 jähriges Mittel**")
-st.write(start_last_20_years, " bis ", end_last_20_years)
-with st.expander(f"Statistik für GTZ {heating_indoor_temperature}/{heating_threshold} für 20-Jahres Mittel ", expanded=False):
-    st.dataframe(gradtagzahl_last_20_years)
-col1, col2 = st.columns(2)
-col1.metric(label="Gradtagzahl ", value=GTZ_specific_last_20_years)
-col2.metric(label="Heiztage ", value=heating_days_specific_last_20_years)
\ No newline at end of file
+
+# Poll for the reference period only while it is loading, partial reruns leave the part above untouched
+reference_polling = not reference_future.done()
+
+
+@st.fragment(run_every=1 if reference_polling else None)
+def last_20_years_section():
+    if not reference_future.done():
+        st.info(f"20-Jahres Mittel ({start_last_20_years.year} bis {end_last_20_years.year}) wird geladen …")
+        return
+    if reference_polling:
+        # Finished while polling, rerun the page once to stop polling, the selected year is memoized
+        st.rerun()
+    if reference_future.exception() is not None:
+        # Show the error once, the next rerun submits the download again
+        st.session_state.pop("reference_fetch", None)
+    reference_future.result()  # Surface download errors
+
+    gradtagzahl_last_20_years, gtz_normals_bands, gtz_ratio_band = memoize("last_20_years", calculation_key, calculate_last_20_years)
+
+    GTZ_specific_last_20_years=gradtagzahl_last_20_years["GTZ"].sum()
+    heating_days_specific_last_20_years= gradtagzahl_last_20_years["heating_days"].sum()
+
+    # Rename the columns
+    gradtagzahl_last_20_years = gradtagzahl_last_20_years.rename({
+        "month": "Monat",
+        "GTZ": f"GTZ {heating_indoor_temperature}/{heating_threshold} ",
+        "heating_days": "Heiztage",
+        "avg_monthly_temperature": "Außentemperatur",
+        "avg_monthly_temperature_on_heating_day": "Außentemperatur an Heiztagen"
+    })
+
+    st.metric(label=f"Verhältnis der Gradtagzahlen GTZ {heating_indoor_temperature}/{heating_threshold} für {year} zum 20-Jahres Mittel am gleichen Standort", value=ratio(GTZ_specific_year, GTZ_specific_last_20_years))
+    if np.isfinite(gtz_ratio_band).all():
+        st.caption(f"95 %-Intervall (Bootstrap über die Referenzjahre): {gtz_ratio_band[0]:.2f} bis {gtz_ratio_band[2]:.2f}")
+    else:
+        st.caption("Kein 95 %-Intervall: nicht jeder Monat hat Daten in den Referenzjahren")
+    st.metric(label=f"Verhältnis der Heiztage HT {heating_threshold} für {year} zum 20-Jahres Mittel am gleichen Standort", value=ratio(heating_days_specific_year, heating_days_specific_last_20_years))
+
+    st.write(f"**GTZ 20 jähriges Mittel**")
+    st.write(start_last_20_years, " bis ", end_last_20_years)
+    with st.expander(f"Statistik für GTZ {heating_indoor_temperature}/{heating_threshold} für 20-Jahres Mittel ", expanded=False):
+        st.dataframe(gradtagzahl_last_20_years)
+    col1, col2 = st.columns(2)
+    col1.metric(label="Gradtagzahl ", value=GTZ_specific_last_20_years)
+    col2.metric(label="Heiztage ", value=heating_days_specific_last_20_years)
+
+    # Monthly GTZ of the selected year against the reference with its 95 % band
+    months = list(range(1, 13))
+    fig = go.Figure([
+        go.Scatter(x=months + months[::-1], y=list(gtz_normals_bands[2]) + list(gtz_normals_bands[0][::-1]), fill="toself", line={"width": 0}, opacity=0.3, name="20-Jahres Mittel 95 %-Intervall"),
+        go.Scatter(x=months, y=gtz_normals_bands[1], name="20-Jahres Mittel (Median)"),
+        go.Scatter(x=months, y=gtz_matrix_specific_year[0], name=f"{year}"),
+    ])
+    fig.update_layout(xaxis_title="Monat", yaxis_title=f"GTZ {heating_indoor_temperature}/{heating_threshold}")
+    st.plotly_chart(fig)
+
+
+last_20_years_section()
@@ -38,8 +38,9 @@ end_date = convert_to_datetime_with_tz(end_date)
 # set session states
 stations_df = st.session_state.closest_stations_df
 stations_ids = st.session_state.station_ids
+candidate_station_ids = st.session_state.candidate_station_ids
 
-daily_avg_temperatures_specific_year = get_daily_temperature(stations_df, stations_ids, start_date, end_date)
+daily_avg_temperatures_specific_year = get_daily_temperature(stations_df, candidate_station_ids, start_date, end_date)
 # Convert Polars DataFrame to Pandas DataFrame
 daily_avg_temperatures_pandas = daily_avg_temperatures_specific_year.to_pandas()
 